@@ -12,10 +12,12 @@
  *   node create-sleep-screen.mjs photo.jpg sleep.bmp
  *   node create-sleep-screen.mjs photo.png sleep.bmp --dither --bits 8
  *   node create-sleep-screen.mjs photo.jpg sleep.bmp --orientation landscape
+ *   node create-sleep-screen.mjs photos/ sleep/ --dither
  */
 
 import sharp from "sharp";
 import fs from "node:fs";
+import os from "node:os";
 import path from "node:path";
 import { parseArgs } from "node:util";
 
@@ -25,6 +27,11 @@ const PORTRAIT_HEIGHT = 800;
 const LANDSCAPE_WIDTH = 800;
 const LANDSCAPE_HEIGHT = 480;
 
+// Input extensions picked up in batch (directory) mode. BMP is left out:
+// sharp's prebuilt libvips cannot decode it, and it is the output format,
+// so re-running into the input folder would pick up earlier results
+const IMAGE_EXTENSIONS = [".png", ".jpg", ".jpeg"];
+
 /**
  * Create grayscale palette for given bit depth
  */
@@ -40,51 +47,95 @@ function createGrayscalePalette(bits) {
 }
 
 /**
- * Quantize grayscale value to target bit depth levels
+ * Build a 256-entry lookup table mapping gray values to palette levels
  */
-function quantizeToLevels(gray, bits) {
+function createLevelLut(bits) {
   const levels = 2 ** bits;
-  return Math.min(levels - 1, Math.floor((gray * levels) / 256));
+  const lut = new Uint8Array(256);
+  for (let gray = 0; gray < 256; gray++) {
+    lut[gray] = Math.min(levels - 1, Math.floor((gray * levels) / 256));
+  }
+  return lut;
 }
 
 /**
- * Apply Floyd-Steinberg dithering to grayscale image
+ * Floyd-Steinberg error diffusion kernel.
+ *
+ * Error only ever reaches the current and the next row, so instead of a
+ * full-frame work copy the kernel keeps two 16-bit row buffers. A row is
+ * loaded into them before any of it is overwritten, which lets finished
+ * pixels go straight back into the source buffer.
  */
-function floydSteinbergDither(pixels, width, height, bits) {
-  const result = new Uint8Array(pixels);
-  const levels = 2 ** bits;
-  const step = Math.floor(255 / (levels - 1));
+function floydSteinbergKernel(pixels, width, height, quantize) {
+  const lastRow = height - 1;
+  const lastCol = width - 1;
+  let cur = new Int16Array(width);
+  let next = new Int16Array(width);
+
+  cur.set(pixels.subarray(0, width));
 
   for (let y = 0; y < height; y++) {
+    const row = y * width;
+    const hasNext = y < lastRow;
+    if (hasNext) {
+      next.set(pixels.subarray(row + width, row + 2 * width));
+    }
+
     for (let x = 0; x < width; x++) {
-      const idx = y * width + x;
-      const oldPixel = result[idx];
+      const oldPixel = cur[x];
 
       // Quantize
-      const level = Math.min(levels - 1, Math.floor((oldPixel * levels) / 256));
-      const newPixel = level * step;
-      result[idx] = newPixel;
+      const newPixel = quantize[oldPixel];
+      pixels[row + x] = newPixel;
 
-      // Calculate error
+      // Calculate error and its 7/16, 3/16, 5/16, 1/16 shares; an
+      // arithmetic shift floors exactly like Math.floor(x / 16)
       const error = oldPixel - newPixel;
-
-      // Distribute error to neighbors
-      if (x + 1 < width) {
-        result[idx + 1] = Math.max(0, Math.min(255, result[idx + 1] + Math.floor((error * 7) / 16)));
+      const e7 = (error * 7) >> 4;
+      const e3 = (error * 3) >> 4;
+      const e5 = (error * 5) >> 4;
+      const e1 = error >> 4;
+      let v;
+
+      // Distribute error to neighbors, saturating to 0-255
+      if (x < lastCol) {
+        v = cur[x + 1] + e7;
+        cur[x + 1] = v < 0 ? 0 : v > 255 ? 255 : v;
       }
-      if (y + 1 < height) {
+      if (hasNext) {
         if (x > 0) {
-          result[idx + width - 1] = Math.max(0, Math.min(255, result[idx + width - 1] + Math.floor((error * 3) / 16)));
+          v = next[x - 1] + e3;
+          next[x - 1] = v < 0 ? 0 : v > 255 ? 255 : v;
         }
-        result[idx + width] = Math.max(0, Math.min(255, result[idx + width] + Math.floor((error * 5) / 16)));
-        if (x + 1 < width) {
-          result[idx + width + 1] = Math.max(0, Math.min(255, result[idx + width + 1] + Math.floor(error / 16)));
+        v = next[x] + e5;
+        next[x] = v < 0 ? 0 : v > 255 ? 255 : v;
+        if (x < lastCol) {
+          v = next[x + 1] + e1;
+          next[x + 1] = v < 0 ? 0 : v > 255 ? 255 : v;
         }
       }
     }
+
+    [cur, next] = [next, cur];
   }
+}
+
+/**
+ * Apply Floyd-Steinberg dithering to grayscale image (in place)
+ */
+function floydSteinbergDither(pixels, width, height, bits) {
+  // 8-bit output keeps every gray value, so there is no error to diffuse
+  if (bits === 8) {
+    return pixels;
+  }
+
+  // Gray value -> gray value of the palette entry it quantizes to
+  const palette = createGrayscalePalette(bits);
+  const quantize = Uint8Array.from(createLevelLut(bits), (index) => palette[index][0]);
 
-  return result;
+  floydSteinbergKernel(pixels, width, height, quantize);
+
+  return pixels;
 }
 
 /**
@@ -92,6 +143,8 @@ function floydSteinbergDither(pixels, width, height, bits) {
  */
 function writeBmp(pixels, width, height, outputPath, bits) {
   const levels = 2 ** bits;
+  const palette = createGrayscalePalette(bits);
+  const lut = createLevelLut(bits);
 
   // Calculate row bytes with 4-byte alignment
   const pixelsPerByte = 8 / bits;
@@ -109,74 +162,80 @@ function writeBmp(pixels, width, height, outputPath, bits) {
   const fileSize = pixelDataOffset + pixelDataSize;
 
   const buffer = Buffer.alloc(fileSize);
-  let offset = 0;
-
-  // BMP File Header (14 bytes)
-  buffer.write("BM", offset);
-  offset += 2;
-  buffer.writeUInt32LE(fileSize, offset);
-  offset += 4;
-  buffer.writeUInt16LE(0, offset); // Reserved
-  offset += 2;
-  buffer.writeUInt16LE(0, offset); // Reserved
-  offset += 2;
-  buffer.writeUInt32LE(pixelDataOffset, offset);
-  offset += 4;
+
+  // BMP File Header (14 bytes) at fixed offsets; reserved fields stay zero
+  buffer.write("BM", 0);
+  buffer.writeUInt32LE(fileSize, 2);
+  buffer.writeUInt32LE(pixelDataOffset, 10);
 
   // DIB Header (BITMAPINFOHEADER - 40 bytes)
-  buffer.writeUInt32LE(dibHeaderSize, offset);
-  offset += 4;
-  buffer.writeInt32LE(width, offset);
-  offset += 4;
-  buffer.writeInt32LE(height, offset); // Positive = bottom-up
-  offset += 4;
-  buffer.writeUInt16LE(1, offset); // Planes
-  offset += 2;
-  buffer.writeUInt16LE(bits, offset); // Bits per pixel
-  offset += 2;
-  buffer.writeUInt32LE(0, offset); // Compression (BI_RGB)
-  offset += 4;
-  buffer.writeUInt32LE(pixelDataSize, offset);
-  offset += 4;
-  buffer.writeInt32LE(2835, offset); // X pixels per meter (72 DPI)
-  offset += 4;
-  buffer.writeInt32LE(2835, offset); // Y pixels per meter (72 DPI)
-  offset += 4;
-  buffer.writeUInt32LE(levels, offset); // Colors used
-  offset += 4;
-  buffer.writeUInt32LE(levels, offset); // Important colors
-  offset += 4;
-
-  // Write grayscale palette
-  const palette = createGrayscalePalette(bits);
+  buffer.writeUInt32LE(dibHeaderSize, 14);
+  buffer.writeInt32LE(width, 18);
+  buffer.writeInt32LE(height, 22); // Positive = bottom-up
+  buffer.writeUInt16LE(1, 26); // Planes
+  buffer.writeUInt16LE(bits, 28); // Bits per pixel
+  buffer.writeUInt32LE(0, 30); // Compression (BI_RGB)
+  buffer.writeUInt32LE(pixelDataSize, 34);
+  buffer.writeInt32LE(2835, 38); // X pixels per meter (72 DPI)
+  buffer.writeInt32LE(2835, 42); // Y pixels per meter (72 DPI)
+  buffer.writeUInt32LE(levels, 46); // Colors used
+  buffer.writeUInt32LE(levels, 50); // Important colors
+
+  // Write grayscale palette, one little-endian B, G, R, reserved word per entry
+  let offset = fileHeaderSize + dibHeaderSize;
   for (const [r, g, b] of palette) {
-    buffer.writeUInt8(b, offset++); // Blue
-    buffer.writeUInt8(g, offset++); // Green
-    buffer.writeUInt8(r, offset++); // Red
-    buffer.writeUInt8(0, offset++); // Reserved
+    buffer.writeUInt32LE((r << 16) | (g << 8) | b, offset);
+    offset += 4;
   }
 
-  // Write pixel data (bottom-up)
-  for (let y = height - 1; y >= 0; y--) {
-    const rowData = Buffer.alloc(rowBytesPadded);
-    let byteIdx = 0;
-    let bitPos = 8 - bits;
-
-    for (let x = 0; x < width; x++) {
-      const idx = y * width + x;
-      const gray = pixels[idx];
-      const level = quantizeToLevels(gray, bits);
-
-      rowData[byteIdx] |= level << bitPos;
-      bitPos -= bits;
+  // 8-bit: palette index equals the gray value, so rows are copied natively
+  if (bits === 8) {
+    const src = Buffer.from(pixels.buffer, pixels.byteOffset, width * height);
+    for (let y = height - 1; y >= 0; y--) {
+      src.copy(buffer, offset, y * width, (y + 1) * width);
+      offset += rowBytesPadded;
+    }
+    fs.writeFileSync(outputPath, buffer);
+    return;
+  }
 
-      if (bitPos < 0) {
-        byteIdx++;
-        bitPos = 8 - bits;
+  // 4-bit: two pixels per byte, high nibble first, packed straight from the
+  // source; odd widths leave the final low nibble zero
+  if (bits === 4) {
+    const pairs = width >> 1;
+    for (let y = height - 1; y >= 0; y--) {
+      let src = y * width;
+      let dst = offset;
+      for (let p = 0; p < pairs; p++, src += 2) {
+        buffer[dst++] = (lut[pixels[src]] << 4) | lut[pixels[src + 1]];
       }
+      if (width & 1) {
+        buffer[dst] = lut[pixels[src]] << 4;
+      }
+      offset += rowBytesPadded;
     }
+    fs.writeFileSync(outputPath, buffer);
+    return;
+  }
 
-    rowData.copy(buffer, offset);
+  // 2-bit: four pixels per byte at shifts 6, 4, 2, 0, packed straight from
+  // the source; a partial final byte keeps its unused low bits zero
+  const quads = width >> 2;
+  const tail = width & 3;
+  for (let y = height - 1; y >= 0; y--) {
+    let src = y * width;
+    let dst = offset;
+    for (let q = 0; q < quads; q++, src += 4) {
+      buffer[dst++] =
+        (lut[pixels[src]] << 6) | (lut[pixels[src + 1]] << 4) | (lut[pixels[src + 2]] << 2) | lut[pixels[src + 3]];
+    }
+    if (tail) {
+      let packed = 0;
+      for (let k = 0; k < tail; k++) {
+        packed |= lut[pixels[src + k]] << (6 - 2 * k);
+      }
+      buffer[dst] = packed;
+    }
     offset += rowBytesPadded;
   }
 
@@ -187,47 +246,23 @@ function writeBmp(pixels, width, height, outputPath, bits) {
  * Resize image according to fit mode using sharp
  */
 async function resizeImage(inputPath, targetWidth, targetHeight, fit) {
-  let image = sharp(inputPath).grayscale();
-
-  if (fit === "stretch") {
-    return image.resize(targetWidth, targetHeight, { fit: "fill" }).raw().toBuffer();
-  } else if (fit === "cover") {
-    return image.resize(targetWidth, targetHeight, { fit: "cover" }).raw().toBuffer();
-  } else {
-    // contain (default) - fit within target, white background
-    const metadata = await sharp(inputPath).metadata();
-    const srcRatio = metadata.width / metadata.height;
-    const dstRatio = targetWidth / targetHeight;
-
-    let newWidth, newHeight;
-    if (srcRatio > dstRatio) {
-      newWidth = targetWidth;
-      newHeight = Math.round(metadata.height * targetWidth / metadata.width);
-    } else {
-      newHeight = targetHeight;
-      newWidth = Math.round(metadata.width * targetHeight / metadata.height);
-    }
-
-    const resized = await image
-      .resize(newWidth, newHeight, { fit: "fill" })
-      .raw()
-      .toBuffer();
-
-    // Create white background and paste centered
-    const result = Buffer.alloc(targetWidth * targetHeight, 255);
-    const xOffset = Math.floor((targetWidth - newWidth) / 2);
-    const yOffset = Math.floor((targetHeight - newHeight) / 2);
-
-    for (let y = 0; y < newHeight; y++) {
-      for (let x = 0; x < newWidth; x++) {
-        const srcIdx = y * newWidth + x;
-        const dstIdx = (y + yOffset) * targetWidth + (x + xOffset);
-        result[dstIdx] = resized[srcIdx];
-      }
-    }
-
-    return result;
-  }
+  // A single libvips pipeline: flatten onto white, grayscale, resize and
+  // (for contain) pad centered, all without intermediate JS buffers
+  const modes = { stretch: "fill", cover: "cover", contain: "contain" };
+
+  return sharp(inputPath)
+    .flatten({ background: "#ffffff" })
+    .grayscale()
+    .resize(targetWidth, targetHeight, {
+      fit: modes[fit],
+      background: "#ffffff",
+      // JPEG/WebP still shrink on load, but libvips keeps the decode at
+      // least twice the target size so Lanczos has real pixels to work
+      // with; the default decodes smaller and can leave moire in photos
+      fastShrinkOnLoad: false,
+    })
+    .raw()
+    .toBuffer();
 }
 
 async function convertImage(inputPath, outputPath, orientation, bits, dither, fit) {
@@ -258,14 +293,95 @@ async function convertImage(inputPath, outputPath, orientation, bits, dither, fi
   console.log(`  Dithering: ${dither ? "enabled" : "disabled"}`);
 }
 
+/**
+ * Run worker over items with at most limit calls in flight
+ */
+async function runPool(items, limit, worker) {
+  let next = 0;
+  const runners = Array.from({ length: Math.min(limit, items.length) }, async () => {
+    while (next < items.length) {
+      await worker(items[next++]);
+    }
+  });
+  await Promise.all(runners);
+}
+
+/**
+ * Convert every image in inputDir to a same-named BMP in outputDir.
+ *
+ * Decoding and resizing run on the libuv thread pool inside sharp, so
+ * keeping several files in flight overlaps them with the JS dithering
+ * and packing of the others. Inputs that would share an output name
+ * (e.g. a.png and a.jpg) are skipped and reported rather than racing to
+ * the same BMP. Returns the number of failed files.
+ */
+async function convertDirectory(inputDir, outputDir, jobs, options) {
+  const inputs = fs
+    .readdirSync(inputDir)
+    .filter((name) => IMAGE_EXTENSIONS.includes(path.extname(name).toLowerCase()))
+    .sort();
+
+  if (inputs.length === 0) {
+    console.error(`Error: No images found in: ${inputDir}`);
+    return 1;
+  }
+
+  if (fs.existsSync(outputDir) && !fs.statSync(outputDir).isDirectory()) {
+    console.error(`Error: Output is not a directory: ${outputDir}`);
+    return 1;
+  }
+  fs.mkdirSync(outputDir, { recursive: true });
+
+  // Group inputs by output file name; compared case-insensitively so the
+  // check also holds on case-insensitive file systems
+  const byOutput = new Map();
+  for (const name of inputs) {
+    const outputName = `${path.parse(name).name}.bmp`;
+    const key = outputName.toLowerCase();
+    if (!byOutput.has(key)) byOutput.set(key, { outputName, names: [] });
+    byOutput.get(key).names.push(name);
+  }
+
+  let failed = 0;
+  const tasks = [];
+  for (const { outputName, names } of byOutput.values()) {
+    if (names.length > 1) {
+      console.error(`Skipping ${names.join(", ")}: all would be written to ${outputName}`);
+      failed += names.length;
+    } else {
+      tasks.push({ name: names[0], outputName });
+    }
+  }
+
+  await runPool(tasks, jobs, async ({ name, outputName }) => {
+    const inputPath = path.join(inputDir, name);
+    const outputPath = path.join(outputDir, outputName);
+    // Lowercased so Photo.BMP -> Photo.bmp is caught on case-insensitive file systems
+    if (path.resolve(inputPath).toLowerCase() === path.resolve(outputPath).toLowerCase()) {
+      console.error(`Skipping ${inputPath}: output would overwrite the input`);
+      failed++;
+      return;
+    }
+    try {
+      await convertImage(inputPath, outputPath, ...options);
+    } catch (error) {
+      console.error(`Error: ${inputPath}: ${error.message}`);
+      failed++;
+    }
+  });
+
+  return failed;
+}
+
 async function main() {
   const { values, positionals } = parseArgs({
     allowPositionals: true,
     options: {
       orientation: { type: "string", default: "portrait" },
-      bits: { type: "string", default: "4" },
+      bits: { type: "string", default: "2" },
       dither: { type: "boolean", default: false },
       fit: { type: "string", default: "contain" },
+      jobs: { type: "string", short: "j", default: String(os.availableParallelism()) },
       help: { type: "boolean", short: "h", default: false },
     },
   });
@@ -278,20 +394,24 @@ Usage:
   node create-sleep-screen.mjs <input> <output> [options]
 
 Arguments:
-  input     Input image (PNG, JPG, BMP)
-  output    Output BMP file
+  input     Input image (PNG, JPG, BMP), or a directory of PNG/JPG images
+  output    Output BMP file, or output directory when input is a directory
 
 Options:
   --orientation <mode>  Screen orientation: portrait, landscape (default: portrait)
-  --bits <n>            Output bit depth: 2, 4, 8 (default: 4)
+  --bits <n>            Output bit depth: 2, 4, 8 (default: 2). The reader
+                        displays 2- and 8-bit files on its 4 gray levels;
+                        the firmware rejects 4-bit BMPs
   --dither              Enable Floyd-Steinberg dithering
   --fit <mode>          Resize mode: contain, cover, stretch (default: contain)
+  -j, --jobs <n>        Images converted concurrently in batch mode (default: CPU count)
   -h, --help            Show this help message
 
 Examples:
   node create-sleep-screen.mjs photo.jpg sleep.bmp
   node create-sleep-screen.mjs photo.png sleep.bmp --dither
   node create-sleep-screen.mjs photo.jpg sleep.bmp --bits 8 --orientation landscape
+  node create-sleep-screen.mjs photos/ sleep/ --dither
 `);
     process.exit(positionals.length < 2 && !values.help ? 1 : 0);
   }
@@ -299,6 +419,7 @@ Examples:
   const inputPath = positionals[0];
   const outputPath = positionals[1];
   const bits = parseInt(values.bits, 10);
+  const jobs = parseInt(values.jobs, 10);
 
   if (!fs.existsSync(inputPath)) {
     console.error(`Error: Input file not found: ${inputPath}`);
@@ -320,8 +441,25 @@ Examples:
     process.exit(1);
   }
 
+  if (!(jobs >= 1)) {
+    console.error("Error: Jobs must be a positive number");
+    process.exit(1);
+  }
+
+  const options = [values.orientation, bits, values.dither, values.fit];
+
+  if (fs.statSync(inputPath).isDirectory()) {
+    try {
+      const failed = await convertDirectory(inputPath, outputPath, jobs, options);
+      process.exit(failed ? 1 : 0);
+    } catch (error) {
+      console.error(`Error: ${error.message}`);
+      process.exit(1);
+    }
+  }
+
   try {
-    await convertImage(inputPath, outputPath, values.orientation, bits, values.dither, values.fit);
+    await convertImage(inputPath, outputPath, ...options);
   } catch (error) {
     console.error(`Error: ${error.message}`);
     process.exit(1);
@@ -12,10 +12,13 @@ Converts TTF/OTF fonts to:
 Based on epdiy fontconvert: https://github.com/vroland/epdiy
 """
 import argparse
+import contextlib
 import math
+import os
 import struct
 import sys
 from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import freetype
@@ -245,6 +248,21 @@ def convert_font(font_paths, size, intervals, is_2bit):
     }
 
 
+def convert_font_task(task):
+    """Worker entry point for parallel conversion: (font_paths, size, intervals, is_2bit)."""
+    return convert_font(*task)
+
+
+@contextlib.contextmanager
+def task_mapper(workers, task_count):
+    """Yield a process pool's map when parallelism helps, else the builtin map."""
+    if workers > 1 and task_count > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, task_count)) as executor:
+            yield executor.map
+    else:
+        yield map
+
+
 def write_header(output_path, font_name, data, cmd_line):
     """Write font data as C header file."""
     glyphs = data["glyphs"]
@@ -508,6 +526,13 @@ Examples:
         action="append",
         help="Additional code point intervals as min,max (can be repeated)",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Parallel conversion processes (default: CPU count)",
+    )
 
     args = parser.parse_args()
 
@@ -546,6 +571,7 @@ Examples:
             print("Including Arabic script")
         print()
 
+        conversions = []
         for size in sizes:
             if args.all_sizes:
                 family_dir = output_base / f"{family_name}-{size}"
@@ -557,9 +583,15 @@ Examples:
                 if not font_path.exists():
                     print(f"Warning: Font file not found: {font_path}", file=sys.stderr)
                     continue
-
-                print(f"Converting: {font_path.name} ({size}pt {style_name})...")
-                data = convert_font([font_path], size, intervals, args.is_2bit)
+                conversions.append((size, family_dir, style_name, font_path))
+
+        # Each size/style is independent and CPU-bound in Python, so fan out
+        # across processes; results are consumed in submission order.
+        tasks = [([font_path], size, intervals, args.is_2bit) for size, _, _, font_path in conversions]
+        with task_mapper(args.jobs, len(tasks)) as task_map:
+            results = task_map(convert_font_task, tasks)
+            for (size, family_dir, style_name, font_path), data in zip(conversions, results):
+                print(f"Converted: {font_path.name} ({size}pt {style_name})")
                 if data is None:
                     continue
 